@@ -0,0 +1,98 @@
+"""
+Startup benchmark of the tester, for suites small enough that startup dominates their run time.
+Times runs of a one-test suite and checks which modules they import, failing if the median run is over the
+budget or if a module that should only be imported when needed (e.g. to render a failure) was imported.
+Requires a POSIX shell to run the suite's test.
+
+Usage: python benchmarks/startup.py [--runs N] [--budget-ms MS]
+"""
+import argparse
+import subprocess
+import sys
+from os import environ, chmod
+from os.path import dirname, abspath, join
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+TESTER_PATH = join(dirname(dirname(abspath(__file__))), 'run_tests.py')
+DEFAULT_RUNS = 20
+DEFAULT_BUDGET_MS = 150
+
+# Modules a passing one-test suite should not import
+LAZY_MODULES = ('difflib', 'statistics', 'multiprocessing', 'platform', 'utils.matam_html', 'utils.matam_build',
+                'utils.matam_scheduling')
+
+SUITE = '''{
+  "templates": {"print": ":::out:::"},
+  "tests": [
+    {"name": "Startup Test", "template": "print", "params": {"out": "startup.out"},
+     "output_file": "startup.out", "expected_output_file": "startup.expected", "run_leaks": false}
+  ]
+}'''
+
+
+def create_suite(workdir: str) -> list[str]:
+    """
+    :return: Tester's command line for the suite
+    """
+    with open(join(workdir, 'tests.json'), "w", encoding='utf-8') as file:
+        file.write(SUITE)
+    with open(join(workdir, 'startup.expected'), "w", encoding='utf-8') as file:
+        file.write('ok\n')
+    executable_path = join(workdir, 'print_ok')
+    with open(executable_path, "w", encoding='utf-8') as file:
+        file.write('#!/bin/sh\nprintf "ok\\n" > "$1"\n')
+    chmod(executable_path, 0o755)
+    return [sys.executable, TESTER_PATH, 'tests.json', 'print_ok']
+
+
+def run_tester(command: list[str], workdir: str, env: dict[str, str]) -> subprocess.CompletedProcess:
+    proc = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0 or 'passed' not in proc.stdout:
+        sys.exit(f'Tester run failed:\n{proc.stdout}\n{proc.stderr}')
+    return proc
+
+
+def find_imported_lazy_modules(command: list[str], workdir: str, env: dict[str, str]) -> list[str]:
+    proc = run_tester([command[0], '-X', 'importtime', *command[1:]], workdir, env)
+    # Lines are formatted as "import time: self [us] | cumulative | module", indented by nesting level
+    imported = {line.rsplit('|', 1)[-1].strip() for line in proc.stderr.splitlines()
+                if line.startswith('import time:')}
+    return [module for module in LAZY_MODULES if module in imported]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    env = {**environ, 'MATAM_TESTER_SKIP_REPORT_ON_PASS': '1'}
+    with TemporaryDirectory() as workdir:
+        command = create_suite(workdir)
+        # Warm up the OS file cache and the tester's bytecode cache
+        run_tester(command, workdir, env)
+
+        durations: list[float] = []
+        for _ in range(args.runs):
+            start = perf_counter()
+            run_tester(command, workdir, env)
+            durations.append((perf_counter() - start) * 1000)
+        lazy_modules = find_imported_lazy_modules(command, workdir, env)
+
+    median_ms = median(durations)
+    print(f'Startup of a one-test suite: median {median_ms:.1f}ms, min {min(durations):.1f}ms '
+          f'over {args.runs} runs (budget {args.budget_ms:.0f}ms)')
+    failures: list[str] = []
+    if median_ms > args.budget_ms:
+        failures.append(f'Median run took {median_ms:.1f}ms, over the budget of {args.budget_ms:.0f}ms')
+    if lazy_modules:
+        failures.append(f'Modules that should be imported lazily were imported: {", ".join(lazy_modules)}')
+    if failures:
+        sys.exit('\n'.join(failures))
+    print('Startup is within budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,55 @@
 import sys
-from os import getcwd, chdir, linesep
+from os import getcwd, chdir, remove
 from os.path import dirname, join, normpath, isfile, isdir
 import subprocess
 import json
-
-from multiprocessing.dummy import Pool as ThreadPool
+from functools import cache
+from time import perf_counter
 
 from utils.config import RUN_MULTI_THREAD, FINAL_REPORT, EXECUTABLE_INDEX, TESTS_JSON_FILE_INDEX, \
     EXPECTED_ARGS_AMOUNT, \
-    TIMEOUT, COMPARISON_IGNORE_BLANK_LINES, COMPARISON_TRIM_END_SPACES, VALGRIND_TIMEOUT, STDERR, \
+    VALGRIND_TIMEOUT, STDERR, \
     STDOUT, \
     LEAKS_CHECKER_NAME, NO_LEAKS_FOUND_TEXT, TEMPLATE_NAME, PARAMS, TEST_NAME, EXPECTED_OUTPUT_FILE, \
-    EXPECTED_OUTPUT_IS_SUBSTR, OUTPUT_FILE, EXPORT_TEMP_REPORT, LEAKS_CHECKER_COMMAND, TEMP_REPORT
+    EXPECTED_OUTPUT_IS_SUBSTR, OUTPUT_FILE, EXPORT_TEMP_REPORT, LEAKS_CHECKER_COMMAND, TEMP_REPORT, \
+    REPEAT_COUNT, COMPARATOR, TOLERANCE, COMPARATORS, EXACT_COMPARATOR, TEST_WALL_TIMEOUT, LEAK_BUDGET, BUILD, \
+    HISTORY_FILE, REGEX_LINES_COMPARATOR, \
+    SKIP_REPORT_ON_PASS
 from utils.loading_bar import print_progress_bar
-from utils.matam_html import create_html_report_from_results, generate_side_by_side_diff
+from utils.matam_compare import compare_outputs, find_invalid_regex_line
+from utils.matam_expected import prefetch_expected_outputs
+from utils.matam_limits import create_launcher_command, pin_process, describe_limit_violation, get_worker_count, \
+    get_worker_core, inherit_worker_core
 from utils.matam_parsing import summarize_failed_test_due_to_exception, \
     test_exception_to_error_text, \
     normalize_newlines, summarize_failed_test, summarize_failed_to_check_for_leaks, \
     remove_error_pipes_from_command, \
-    parse_ranged_tests
-from utils.matam_types import TestResult, TestFile, Summary, TestCase, TestTemplates
+    parse_ranged_tests, normalize_for_comparison, summarize_repetitions, summarize_repeated_test, \
+    summarize_skipped_leaks_test, summarize_failed_build, hash_output
+from utils.matam_process import run_process
+from utils.matam_types import TestResult, TestFile, Summary, TestCase, TestTemplates, TestParams, \
+    RepetitionOutcome, ExpectedOutputs, BuildResult, HistoryRun
 
 if sys.version_info < (3, 10):
     sys.exit("Python %s.%s or later is required.\n" % (3, 10))
 else:
     from typing import get_type_hints
 
+# Modules that are only needed for some runs (report rendering, build stage, threads, etc.) are imported where
+# they are used, to keep the startup of small suites fast
+
+
+@cache
+def get_test_case_type_hints() -> dict[str, type]:
+    return get_type_hints(TestCase)
+
 
 def execute_test(command: str, relative_workdir: str, name: str, expected_output: str,
                  output_path: str,
-                 results: list[TestResult], expected_is_substr: bool = False) -> None:
+                 results: list[TestResult], expected_is_substr: bool = False, comparator: str | None = None,
+                 tolerance: float | None = None) -> None:
     try:
-        with subprocess.Popen(command, shell=True, cwd=getcwd()) as proc:
-            try:
-                proc.communicate(timeout=TIMEOUT)
-            except subprocess.TimeoutExpired as e:
-                proc.kill()
-                results.append({
-                    'name': name,
-                    'summary': summarize_failed_test_due_to_exception(name, expected_output,
-                                                                      test_exception_to_error_text(
-                                                                          e)),
-                    'passed': False,
-                    'command': f'export TESTER_TMP_PWD=$(pwd) && cd {relative_workdir} && {command} && cd $TESTER_TMP_PWD && unset TESTER_TMP_PWD'
-                })
-                return
+        process_run = run_process(create_launcher_command(command), TEST_WALL_TIMEOUT)
     except subprocess.CalledProcessError as e:
         results.append({
             'name': name,
@@ -72,6 +77,16 @@ def execute_test(command: str, relative_workdir: str, name: str, expected_output
         })
         return
 
+    limit_violation: str | None = describe_limit_violation(process_run['returncode'])
+    if limit_violation is not None:
+        results.append({
+            'name': name,
+            'summary': summarize_failed_test_due_to_exception(name, expected_output, limit_violation),
+            'passed': False,
+            'command': f'export TESTER_TMP_PWD=$(pwd) && cd {relative_workdir} && {command} && cd $TESTER_TMP_PWD && unset TESTER_TMP_PWD'
+        })
+        return
+
     try:
         # norm path makes sure the path is formatted correctly
         with open(normpath(output_path), "r", encoding='utf-8') as file:
@@ -95,42 +110,153 @@ def execute_test(command: str, relative_workdir: str, name: str, expected_output
         })
         return
 
-    # Remove blank lines
-    if COMPARISON_IGNORE_BLANK_LINES != 0:
-        actual_output = linesep.join([s for s in actual_output.splitlines() if s])
-        expected_output = linesep.join([s for s in expected_output.splitlines() if s])
-
-    # Trim spaces from end of lines
-    if COMPARISON_TRIM_END_SPACES != 0:
-        actual_output = linesep.join([s.rstrip() for s in actual_output.splitlines()])
-        expected_output = linesep.join([s.rstrip() for s in expected_output.splitlines()])
+    actual_output = normalize_for_comparison(actual_output)
 
-    compare_result: bool = actual_output == expected_output
-    if expected_is_substr:
-        compare_result = expected_output in actual_output
+    compare_result, mismatches = compare_outputs(expected_output, actual_output, comparator, expected_is_substr,
+                                                 tolerance)
 
     if compare_result:
         results.append({
             'name': name,
             'summary': Summary(title=f"\n{name} - Passed!\n"),
-            'passed': True
+            'passed': True,
+            'duration': process_run['duration'],
+            'peak_memory_kb': process_run['peak_memory_kb'],
+            'output_hash': hash_output(actual_output)
         })
     else:
-        diff_html = generate_side_by_side_diff(expected_output, actual_output, name)
+        from utils.matam_html import generate_comparison_diff
+        diff_html = generate_comparison_diff(expected_output, actual_output, name, mismatches)
         results.append({
             'name': name,
             'summary': summarize_failed_test(name, expected_output, actual_output, diff_html),
             'passed': False,
-            'command': f'export TESTER_TMP_PWD=$(pwd) && cd {relative_workdir} && {command} && cd $TESTER_TMP_PWD && unset TESTER_TMP_PWD'
+            'command': f'export TESTER_TMP_PWD=$(pwd) && cd {relative_workdir} && {command} && cd $TESTER_TMP_PWD && unset TESTER_TMP_PWD',
+            'duration': process_run['duration'],
+            'peak_memory_kb': process_run['peak_memory_kb'],
+            'output_hash': hash_output(actual_output)
         })
 
 
+def remove_if_exists(path: str) -> None:
+    try:
+        remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def execute_repetition(command: str, output_path: str, expected_output: str, expected_is_substr: bool,
+                       comparator: str | None, tolerance: float | None, remove_output: bool,
+                       worker_core: int | None) -> RepetitionOutcome:
+    inherit_worker_core(worker_core)
+    # norm path makes sure the path is formatted correctly
+    # A run that writes nothing must not be judged by the output left by a previous run
+    remove_if_exists(normpath(output_path))
+    outcome: RepetitionOutcome = run_repetition(command, output_path, expected_output, expected_is_substr,
+                                                comparator, tolerance)
+    if remove_output:
+        remove_if_exists(normpath(output_path))
+    return outcome
+
+
+def run_repetition(command: str, output_path: str, expected_output: str, expected_is_substr: bool,
+                   comparator: str | None, tolerance: float | None) -> RepetitionOutcome:
+    try:
+        process_run = run_process(create_launcher_command(command), TEST_WALL_TIMEOUT)
+    except subprocess.TimeoutExpired as e:
+        return {'passed': False, 'output': None, 'error': test_exception_to_error_text(e),
+                'duration': float(TEST_WALL_TIMEOUT), 'peak_memory_kb': None}
+    except Exception as e:
+        return {'passed': False, 'output': None, 'error': str(e), 'duration': None, 'peak_memory_kb': None}
+
+    limit_violation: str | None = describe_limit_violation(process_run['returncode'])
+    if limit_violation is not None:
+        return {'passed': False, 'output': None, 'error': limit_violation, 'duration': process_run['duration'],
+                'peak_memory_kb': process_run['peak_memory_kb']}
+
+    try:
+        # norm path makes sure the path is formatted correctly
+        with open(normpath(output_path), "r", encoding='utf-8') as file:
+            actual_output = normalize_for_comparison(normalize_newlines(file.read()))
+    except UnicodeDecodeError as e:
+        return {'passed': False, 'output': None, 'error': f'Test printed invalid output. Exception: {str(e)}',
+                'duration': process_run['duration'], 'peak_memory_kb': process_run['peak_memory_kb']}
+    except FileNotFoundError as e:
+        return {'passed': False, 'output': None, 'error': f'Test failed to provide output. Exception: {str(e)}',
+                'duration': process_run['duration'], 'peak_memory_kb': process_run['peak_memory_kb']}
+
+    passed, _ = compare_outputs(expected_output, actual_output, comparator, expected_is_substr, tolerance)
+    return {'passed': passed, 'output': actual_output, 'error': None, 'duration': process_run['duration'],
+            'peak_memory_kb': process_run['peak_memory_kb']}
+
+
+def execute_repeated_test(executable_path: str, test: TestCase, templates: TestTemplates, relative_workdir: str,
+                          expected_output: str, results: list[TestResult], repeat: int,
+                          expected_is_substr: bool = False, comparator: str | None = None,
+                          tolerance: float | None = None) -> None:
+    name: str = test[TEST_NAME]
+    output_path: str = test[OUTPUT_FILE]
+    command: str = build_test_command(executable_path, test, templates)
+    # Repetitions run on the core of the worker running the test, if workers are pinned
+    worker_core: int | None = get_worker_core()
+    output_params: list[str] = [param_name for param_name, param_value in test[PARAMS].items()
+                                if param_value == output_path]
+    if output_params:
+        # Give every run its own output file, so runs can overlap without clobbering each other
+        fn_args = []
+        for i in range(repeat):
+            run_output_path = f'{output_path}.run{i}'
+            run_params: TestParams = {**test[PARAMS], **{param_name: run_output_path for param_name in output_params}}
+            fn_args.append((build_test_command(executable_path, test, templates, run_params), run_output_path,
+                            expected_output, expected_is_substr, comparator, tolerance, True, worker_core))
+        from multiprocessing.dummy import Pool as ThreadPool
+        pool = ThreadPool(repeat)
+        outcomes: list[RepetitionOutcome] = pool.starmap(execute_repetition, fn_args)
+        pool.close()
+        pool.join()
+        for outcome, run_args in zip(outcomes, fn_args):
+            # Errors mention the per-run output file, which would make identical errors look distinct
+            if outcome['error'] is not None:
+                outcome['error'] = outcome['error'].replace(run_args[1], output_path)
+    else:
+        # Output path is hardcoded in the tested program, runs must not overlap
+        outcomes = [execute_repetition(command, output_path, expected_output, expected_is_substr, comparator,
+                                       tolerance, False, worker_core)
+                    for _ in range(repeat)]
+
+    stats = summarize_repetitions(outcomes)
+    sample: RepetitionOutcome = next((outcome for outcome in outcomes if not outcome['passed']), outcomes[0])
+    diff_html = None
+    if not sample['passed'] and sample['error'] is None:
+        from utils.matam_html import generate_comparison_diff
+        _, mismatches = compare_outputs(expected_output, sample['output'], comparator, expected_is_substr, tolerance)
+        diff_html = generate_comparison_diff(expected_output, sample['output'], name, mismatches)
+    passed: bool = stats['passed_runs'] == stats['runs'] and not stats['flaky']
+    peak_memories: list[int] = [outcome['peak_memory_kb'] for outcome in outcomes
+                                if outcome['peak_memory_kb'] is not None]
+    result: TestResult = {
+        'name': name,
+        'summary': summarize_repeated_test(name, stats, expected_output, sample, diff_html),
+        'passed': passed,
+        'repeat_stats': stats,
+        'duration': stats['median_duration'],
+        'peak_memory_kb': max(peak_memories) if peak_memories else None,
+        # Only a test with a single (proper) output has an output to track
+        'output_hash': hash_output(sample['output'])
+        if len(stats['distinct_outputs']) == 1 and sample['error'] is None else None
+    }
+    if not passed:
+        result['command'] = f'export TESTER_TMP_PWD=$(pwd) && cd {relative_workdir} && {command} && cd $TESTER_TMP_PWD && unset TESTER_TMP_PWD'
+    results.append(result)
+
+
 def execute_memory_leaks_test(command: str, relative_workdir: str, name: str,
                               results: list[TestResult]) -> None:
     try:
         proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True,
                                 cwd=getcwd())
         try:
+            pin_process(proc.pid)
             proc_result = proc.communicate(timeout=VALGRIND_TIMEOUT)
             result = proc_result[STDERR] if proc_result[STDERR] else proc_result[STDOUT]
         except subprocess.TimeoutExpired:
@@ -185,10 +311,31 @@ def execute_memory_leaks_test(command: str, relative_workdir: str, name: str,
         })
 
 
+def build_test_command(executable_path: str, test: TestCase, templates: TestTemplates,
+                       params: TestParams | None = None) -> str:
+    """
+    :param params: Params to use instead of the test's own
+    """
+    args: str = templates[test[TEMPLATE_NAME]]
+    for param_name, param_value in (test[PARAMS] if params is None else params).items():
+        args = args.replace(f':::{param_name}:::', param_value)
+    return f'{executable_path} {args}'
+
+
+def build_leaks_check_command(test_command: str) -> str:
+    command_without_err_pipes: str = remove_error_pipes_from_command(test_command)
+    return f'{LEAKS_CHECKER_COMMAND} {command_without_err_pipes}'
+
+
 def run_test(executable_path: str, relative_workdir: str, initial_workdir: str, test: TestCase,
-             templates: TestTemplates,
-             results: list[TestResult], total_tests: int) -> None:
-    for key, key_type in get_type_hints(TestCase).items():
+             templates: TestTemplates, expected_outputs: ExpectedOutputs,
+             results: list[TestResult], total_tests: int, run_leaks_inline: bool = True) -> bool:
+    """
+    :param expected_outputs: Prefetched expected outputs, already normalized for comparison
+    :param run_leaks_inline: Whether to run the test's leak test right after it, or leave it to the caller
+    :return: Whether the test is valid and was executed
+    """
+    for key, key_type in get_test_case_type_hints().items():
         if key == 'params_range':
             continue
 
@@ -203,31 +350,117 @@ def run_test(executable_path: str, relative_workdir: str, initial_workdir: str,
             })
             print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete',
                                length=50)
-            return
+            return False
 
-    args: str = templates[test[TEMPLATE_NAME]]
-    for param_name, param_value in test[PARAMS].items():
-        args = args.replace(f':::{param_name}:::', param_value)
+    comparator: str | None = test.get(COMPARATOR, None)
+    if comparator is not None and comparator not in COMPARATORS:
+        name = test[TEST_NAME]
+        results.append({
+            'name': name,
+            'summary': Summary(
+                title=f"\nTest \"{name}\": unknown comparator \"{comparator}\", expected one of {', '.join(COMPARATORS)}\n"),
+            'passed': False
+        })
+        print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete',
+                           length=50)
+        return False
+
+    if test.get(EXPECTED_OUTPUT_IS_SUBSTR, False) and comparator not in (None, EXACT_COMPARATOR):
+        name = test[TEST_NAME]
+        results.append({
+            'name': name,
+            'summary': Summary(
+                title=f"\nTest \"{name}\": \"{EXPECTED_OUTPUT_IS_SUBSTR}\" can only be used with the \"{EXACT_COMPARATOR}\" comparator, not \"{comparator}\"\n"),
+            'passed': False
+        })
+        print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete',
+                           length=50)
+        return False
+
+    tolerance: float | None = test.get(TOLERANCE, None)
+    # bool is an int, but is not a valid tolerance
+    if tolerance is not None and (isinstance(tolerance, bool) or not isinstance(tolerance, (int, float))
+                                  or tolerance < 0):
+        name = test[TEST_NAME]
+        results.append({
+            'name': name,
+            'summary': Summary(
+                title=f"\nTest \"{name}\": invalid tolerance {json.dumps(tolerance)}, expected a non-negative number\n"),
+            'passed': False
+        })
+        print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete',
+                           length=50)
+        return False
 
     name: str = test[TEST_NAME]
-    expected_output_path = test.get(EXPECTED_OUTPUT_FILE, None)
-    expected_is_substr: bool = test.get(EXPECTED_OUTPUT_IS_SUBSTR, False)
     # norm path makes sure the path is formatted correctly
-    with open(normpath(expected_output_path), "r", encoding='utf-8') as file:
-        expected_output = normalize_newlines(file.read())
+    expected_output_path = normpath(test.get(EXPECTED_OUTPUT_FILE, None))
+    if expected_output_path in expected_outputs['errors']:
+        results.append({
+            'name': name,
+            'summary': Summary(
+                title=f"\nTest \"{name}\": could not read \"{expected_output_path}\"\n",
+                error=expected_outputs['errors'][expected_output_path]),
+            'passed': False
+        })
+        print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete',
+                           length=50)
+        return False
+    expected_output: str = expected_outputs['outputs'][expected_output_path]
+    expected_is_substr: bool = test.get(EXPECTED_OUTPUT_IS_SUBSTR, False)
+
+    invalid_regex_line = find_invalid_regex_line(expected_output) if comparator == REGEX_LINES_COMPARATOR else None
+    if invalid_regex_line is not None:
+        line_number, error = invalid_regex_line
+        results.append({
+            'name': name,
+            'summary': Summary(
+                title=f"\nTest \"{name}\": line {line_number} of \"{expected_output_path}\" is not a valid regex: {error}\n"),
+            'passed': False
+        })
+        print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete',
+                           length=50)
+        return False
 
     output_path = test[OUTPUT_FILE]
-    test_command: str = f'{executable_path} {args}'
-
-    execute_test(test_command, relative_workdir, name,
-                 expected_output, output_path, results, expected_is_substr=expected_is_substr)
-    if test.get("run_leaks") is not False:
-        command_without_err_pipes: str = remove_error_pipes_from_command(test_command)
-        leaks_check_command: str = f'{LEAKS_CHECKER_COMMAND} {command_without_err_pipes}'
-        execute_memory_leaks_test(leaks_check_command, relative_workdir, name, results)
+    test_command: str = build_test_command(executable_path, test, templates)
+
+    if REPEAT_COUNT > 1:
+        execute_repeated_test(executable_path, test, templates, relative_workdir, expected_output, results,
+                              REPEAT_COUNT, expected_is_substr=expected_is_substr, comparator=comparator,
+                              tolerance=tolerance)
+    else:
+        execute_test(test_command, relative_workdir, name,
+                     expected_output, output_path, results, expected_is_substr=expected_is_substr,
+                     comparator=comparator, tolerance=tolerance)
+    if run_leaks_inline and test.get("run_leaks") is not False:
+        execute_memory_leaks_test(build_leaks_check_command(test_command), relative_workdir, name, results)
     # Advancing progress bar
     print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete', length=50)
     if EXPORT_TEMP_REPORT and not RUN_MULTI_THREAD:
+        from utils.matam_html import create_html_report_from_results
+        create_html_report_from_results(results, initial_workdir, TEMP_REPORT)
+    return True
+
+
+def run_leaks_test_within_budget(executable_path: str, relative_workdir: str, initial_workdir: str,
+                                 test: TestCase, templates: TestTemplates, results: list[TestResult],
+                                 total_tests: int, deadline: float) -> None:
+    name: str = test[TEST_NAME]
+    if perf_counter() >= deadline:
+        results.append({
+            'name': f'{name} - {LEAKS_CHECKER_NAME}',
+            'summary': summarize_skipped_leaks_test(name),
+            'passed': True,
+            'skipped': True
+        })
+    else:
+        test_command: str = build_test_command(executable_path, test, templates)
+        execute_memory_leaks_test(build_leaks_check_command(test_command), relative_workdir, name, results)
+    # Advancing progress bar
+    print_progress_bar(len(results), total_tests, prefix='Progress:', suffix='Complete', length=50)
+    if EXPORT_TEMP_REPORT and not RUN_MULTI_THREAD:
+        from utils.matam_html import create_html_report_from_results
         create_html_report_from_results(results, initial_workdir, TEMP_REPORT)
 
 
@@ -255,6 +488,32 @@ def main():
 
     initial_workdir = getcwd()
 
+    tests_file_path = normpath(join(initial_workdir, sys.argv[TESTS_JSON_FILE_INDEX]))
+
+    workdir = dirname(tests_file_path)
+    relative_workdir = dirname(sys.argv[TESTS_JSON_FILE_INDEX])
+    chdir(workdir)
+
+    tests_data: TestFile = get_tests_data_from_json(tests_file_path)
+    if tests_data.get(BUILD):
+        from utils.matam_build import build_executable
+        print("Building, please wait", flush=True)
+        build_result: BuildResult = build_executable(tests_data[BUILD])
+        if not build_result['succeeded']:
+            print(f"Build failed, see {FINAL_REPORT} for details")
+            build_results: list[TestResult] = [{
+                'name': f"Build - {failure['step']}",
+                'summary': summarize_failed_build(failure['step'], failure['error']),
+                'passed': False
+            } for failure in build_result['failures']]
+            from utils.matam_html import create_html_report_from_results
+            create_html_report_from_results(build_results, initial_workdir, FINAL_REPORT)
+            chdir(initial_workdir)
+            return
+        print(f"Compiled {build_result['compiled']} sources, reused {build_result['reused']} from cache"
+              f"{', relinked' if build_result['relinked'] else ''}", flush=True)
+
+    # Executable is resolved after the build stage, which may create it
     # If EXECUTABLE_INDEX is a file, wrap it in ' so it works even with spaces in path
     exec_path = normpath(join(initial_workdir, sys.argv[EXECUTABLE_INDEX]))
     if isfile(exec_path):
@@ -271,16 +530,15 @@ def main():
             if isfile(curr_arg) or isdir(curr_arg):
                 curr_arg = f"'{curr_arg}'"
             executable += ' ' + curr_arg
-    tests_file_path = normpath(join(initial_workdir, sys.argv[TESTS_JSON_FILE_INDEX]))
-
-    workdir = dirname(tests_file_path)
-    relative_workdir = dirname(sys.argv[TESTS_JSON_FILE_INDEX])
-    chdir(workdir)
 
-    tests_data: TestFile = get_tests_data_from_json(tests_file_path)
     tests_data['tests'] = parse_ranged_tests(tests_data['tests'])
     results: list[TestResult] = []
 
+    expected_outputs: ExpectedOutputs = prefetch_expected_outputs(
+        [test[EXPECTED_OUTPUT_FILE] for test in tests_data['tests'] if EXPECTED_OUTPUT_FILE in test])
+    for path, error in expected_outputs['errors'].items():
+        print(f"Error reading expected output file \"{path}\": {error}")
+
     print("Running tests, please wait", end="", flush=True)
     fn_args = []
 
@@ -292,28 +550,66 @@ def main():
         else:
             total_tests += 1
 
+    # With a leak check budget, leak tests are only scheduled after all tests ran, once we know which failed
+    run_leaks_inline: bool = LEAK_BUDGET <= 0
     print_progress_bar(0, total_tests, prefix='Progress:', suffix='Complete', length=50)
     for test in tests_data['tests']:
         fn_args.append(
-            (executable, relative_workdir, initial_workdir, test, tests_data['templates'], results,
-             total_tests)
+            (executable, relative_workdir, initial_workdir, test, tests_data['templates'], expected_outputs,
+             results, total_tests, run_leaks_inline)
         )
 
     if RUN_MULTI_THREAD:
+        from multiprocessing.dummy import Pool as ThreadPool
         # none to use cpu count
-        pool = ThreadPool(None)
+        pool = ThreadPool(get_worker_count())
 
-        pool.starmap(run_test, fn_args)
+        tests_executed: list[bool] = pool.starmap(run_test, fn_args)
 
         pool.close()
         pool.join()
     else:
-        for args in fn_args:
-            run_test(*args)
+        tests_executed = [run_test(*args) for args in fn_args]
+
+    if not run_leaks_inline:
+        from utils.matam_scheduling import prioritize_leak_tests
+        failed_test_names: set[str] = {result['name'] for result in results if not result['passed']}
+        leak_tests: list[TestCase] = [test for test, executed in zip(tests_data['tests'], tests_executed)
+                                      if executed and test.get('run_leaks') is not False]
+        deadline: float = perf_counter() + LEAK_BUDGET
+        leaks_fn_args = [
+            (executable, relative_workdir, initial_workdir, test, tests_data['templates'], results, total_tests,
+             deadline)
+            for test in prioritize_leak_tests(leak_tests, failed_test_names)
+        ]
+        if RUN_MULTI_THREAD:
+            from multiprocessing.dummy import Pool as ThreadPool
+            pool = ThreadPool(get_worker_count())
+            # Chunks of a single test make sure tests are started in order of priority
+            pool.starmap(run_leaks_test_within_budget, leaks_fn_args, chunksize=1)
+            pool.close()
+            pool.join()
+        else:
+            for args in leaks_fn_args:
+                run_leaks_test_within_budget(*args)
 
     # Print new line to avoid console starting on same line as the loading bar
     print("\n", end="", flush=True)
-    create_html_report_from_results(results, initial_workdir, FINAL_REPORT)
+    from utils.matam_history import load_history, save_history, create_history_run, compare_to_history
+    history_path: str = join(initial_workdir, HISTORY_FILE)
+    history: list[HistoryRun] = load_history(history_path)
+    current_run: HistoryRun = create_history_run(results, tests_file_path)
+    if SKIP_REPORT_ON_PASS and all(result['passed'] for result in results):
+        print(f"All {len(results)} tests passed, skipping report")
+        # Don't leave a report of a previous run around, it could be mistaken for this run's
+        final_report_path: str = join(initial_workdir, FINAL_REPORT)
+        if isfile(final_report_path):
+            remove(final_report_path)
+    else:
+        from utils.matam_html import create_html_report_from_results
+        create_html_report_from_results(results, initial_workdir, FINAL_REPORT,
+                                        compare_to_history(history, current_run))
+    save_history(history_path, [*history, current_run])
     chdir(initial_workdir)
 
 
@@ -1,7 +1,9 @@
-from platform import system
+import sys
 from os import environ
 
-IS_MAC_OS = system() == 'Darwin'
+# sys.platform is used over platform.system(), importing platform is slow relative to the tester's startup
+IS_MAC_OS = sys.platform == 'darwin'
+IS_WINDOWS = sys.platform == 'win32'
 
 LEAKS_CHECKER_NAME = 'leaks' if IS_MAC_OS else 'Valgrind'
 LEAKS_CHECKER_COMMAND = 'export MallocStackLogging=1 && leaks --atExit --' \
@@ -28,16 +30,58 @@ PARAMS = 'params'
 OUTPUT_FILE = 'output_file'
 EXPECTED_OUTPUT_FILE = 'expected_output_file'
 EXPECTED_OUTPUT_IS_SUBSTR = 'expected_output_is_substring'
+COMPARATOR = 'comparator'
+TOLERANCE = 'tolerance'
+RANGE_GROUP = 'range_group'
+BUILD = 'build'
+DEFAULT_COMPILER = 'g++'
+DEFAULT_BUILD_CACHE_DIR = '.matam_build_cache'
 TEMP_REPORT = 'test_results_current.html'
 FINAL_REPORT = 'test_results.html'
+HISTORY_FILE = 'test_results_history.json'
+
+REGRESSION_NEWLY_FAILING = 'Newly failing'
+REGRESSION_NEWLY_PASSING = 'Newly passing'
+REGRESSION_OUTPUT_CHANGED = 'Output changed'
+REGRESSION_SLOWER = 'Slower'
+REGRESSION_MORE_MEMORY = 'More memory'
+# Ignore changes too small to be more than noise
+REGRESSION_MIN_DURATION_DELTA = 0.01  # 10 milliseconds
+REGRESSION_MIN_MEMORY_DELTA_KB = 1024
+
+EXACT_COMPARATOR = 'exact'
+UNORDERED_LINES_COMPARATOR = 'unordered_lines'
+NUMERIC_TOLERANCE_COMPARATOR = 'numeric_tolerance'
+REGEX_LINES_COMPARATOR = 'regex_lines'
+COMPARATORS = (EXACT_COMPARATOR, UNORDERED_LINES_COMPARATOR, NUMERIC_TOLERANCE_COMPARATOR, REGEX_LINES_COMPARATOR)
+DEFAULT_TOLERANCE = 1e-6
 
 TIMEOUT = int(environ.get('MATAM_TESTER_TEST_TIMEOUT', '1'))  # 1 second
 VALGRIND_TIMEOUT = int(environ.get('MATAM_TESTER_VALGRIND_TIMEOUT', '2'))  # 2 seconds
 
+# Resource limits of each test's process (not applied to leak tests, which run under the leaks checker)
+MEMORY_LIMIT_MB = int(environ.get('MATAM_TESTER_MEMORY_LIMIT_MB', '0'))  # 0 for no limit
+OUTPUT_SIZE_LIMIT_MB = int(environ.get('MATAM_TESTER_OUTPUT_SIZE_LIMIT_MB', '0'))  # 0 for no limit
+# Apply the test timeout to CPU time instead of wall time, wall time is then only limited by a safety net
+USE_CPU_TIME_LIMIT = int(environ.get('MATAM_TESTER_CPU_TIME_LIMIT', '0')) == 1
+WALL_TIMEOUT_FACTOR = int(environ.get('MATAM_TESTER_WALL_TIMEOUT_FACTOR', '10'))
+TEST_WALL_TIMEOUT = TIMEOUT * WALL_TIMEOUT_FACTOR if USE_CPU_TIME_LIMIT else TIMEOUT
+# Seconds to spend on leak tests, which are then run after all tests, prioritized. 0 for no budget
+LEAK_BUDGET = float(environ.get('MATAM_TESTER_LEAK_BUDGET', '0'))
+# Amount of previous runs to keep in the results history, 0 to disable it
+HISTORY_SIZE = int(environ.get('MATAM_TESTER_HISTORY_SIZE', '10'))
+# Percentage by which a test's duration or peak memory may grow before it is reported as a regression
+REGRESSION_THRESHOLD_PERCENT = float(environ.get('MATAM_TESTER_REGRESSION_THRESHOLD', '20'))
+PIN_CPUS = int(environ.get('MATAM_TESTER_PIN_CPUS', '0')) == 1
+
 COMPARISON_TRIM_END_SPACES = int(environ.get('MATAM_TESTER_TRIMR_SPACES', '0'))
 COMPARISON_IGNORE_BLANK_LINES = int(environ.get('MATAM_TESTER_IGNORE_EMPTY_LINES', '0'))
 
+REPEAT_COUNT = max(1, int(environ.get('MATAM_TESTER_REPEAT', '1')))
+
 RUN_MULTI_THREAD = int(environ.get('MATAM_TESTER_RUN_MULTI_THREADED', '0')) == 1
+# Don't generate the html report if all tests passed, useful for quick runs (e.g. from editor hooks)
+SKIP_REPORT_ON_PASS = int(environ.get('MATAM_TESTER_SKIP_REPORT_ON_PASS', '0')) == 1
 EXPORT_TEMP_REPORT = int(environ.get('MATAM_TESTER_EXPORT_TEMP_REPORT', '0')) == 1
 
 USE_OLD_DIFF_STYLE = int(environ.get('MATAM_TESTER_USE_OLD_DIFF_STYLE', '0')) == 1
\ No newline at end of file
@@ -0,0 +1,155 @@
+import re
+import subprocess
+from glob import glob
+from hashlib import sha256
+from multiprocessing.dummy import Pool as ThreadPool
+from os import makedirs, replace, remove, listdir
+from os.path import normpath, dirname, join, isfile
+
+from utils.config import DEFAULT_COMPILER, DEFAULT_BUILD_CACHE_DIR
+from utils.matam_types import BuildConfig, BuildFailure, BuildResult
+
+INCLUDE_PATTERN = re.compile(rb'^\s*#\s*include\s*([<"])([^>"]+)[>"]', re.MULTILINE)
+LINK_KEY_FILE = 'link.key'
+
+
+def _remove_stale_objects(cache_dir: str, object_paths: list[str]) -> None:
+    """
+    Remove objects of previous versions of the sources, which are no longer linked, so the cache doesn't keep growing
+    """
+    linked_objects = set(object_paths)
+    for file_name in listdir(cache_dir):
+        object_path = join(cache_dir, file_name)
+        if file_name.endswith('.o') and object_path not in linked_objects:
+            try:
+                remove(object_path)
+            except OSError:
+                pass
+
+
+def _get_include_dirs(flags: list[str]) -> list[str]:
+    include_dirs: list[str] = []
+    for index, flag in enumerate(flags):
+        if flag == '-I' and index + 1 < len(flags):
+            include_dirs.append(flags[index + 1])
+        elif flag.startswith('-I') and flag != '-I':
+            include_dirs.append(flag[2:])
+    return include_dirs
+
+
+def _resolve_include(including_file: str, include: str, is_quoted: bool, include_dirs: list[str]) -> str | None:
+    candidates = [join(dirname(including_file), include)] if is_quoted else []
+    candidates += [join(include_dir, include) for include_dir in include_dirs]
+    for candidate in candidates:
+        if isfile(candidate):
+            return normpath(candidate)
+    # System header, which is not part of the project
+    return None
+
+
+def _hash_with_local_headers(source: str, include_dirs: list[str], file_cache: dict[str, bytes]) -> str:
+    """
+    Hash a source file's content together with the content of all project headers it (transitively) includes
+    """
+    content_hash = sha256()
+    visited: set[str] = set()
+    pending: list[str] = [normpath(source)]
+    while pending:
+        path = pending.pop()
+        if path in visited:
+            continue
+        visited.add(path)
+        if path not in file_cache:
+            with open(path, "rb") as file:
+                file_cache[path] = file.read()
+        content = file_cache[path]
+        content_hash.update(path.encode('utf-8') + b'\0' + sha256(content).digest())
+        for delimiter, include in INCLUDE_PATTERN.findall(content):
+            resolved = _resolve_include(path, include.decode('utf-8', errors='replace'), delimiter == b'"',
+                                        include_dirs)
+            if resolved is not None:
+                pending.append(resolved)
+    return content_hash.hexdigest()
+
+
+def _compile(compiler: str, flags: list[str], source: str, object_path: str) -> BuildFailure | None:
+    if isfile(object_path):
+        return None
+    # Compile to a temporary path, so an interrupted compilation never leaves a broken object in the cache
+    temp_object_path = f'{object_path}.tmp'
+    try:
+        proc = subprocess.run([compiler, *flags, '-c', source, '-o', temp_object_path], capture_output=True)
+    except OSError as e:
+        return BuildFailure(step=source, error=str(e))
+    if proc.returncode != 0:
+        return BuildFailure(step=source, error=(proc.stderr or proc.stdout).decode('utf-8', errors='replace'))
+    replace(temp_object_path, object_path)
+    return None
+
+
+def build_executable(build_config: BuildConfig) -> BuildResult:
+    """
+    Compile the configured sources in parallel and link them, reusing objects from the build cache.
+    Objects are keyed by the compiler, its flags and the content of the source and the project headers it includes,
+    and the executable is only relinked if one of its objects (or the link flags) changed.
+    """
+    compiler: str = build_config.get('compiler') or DEFAULT_COMPILER
+    flags: list[str] = build_config.get('flags') or []
+    link_flags: list[str] = build_config.get('link_flags') or []
+    output: str = normpath(build_config['output'])
+    cache_dir: str = normpath(build_config.get('cache_dir') or DEFAULT_BUILD_CACHE_DIR)
+
+    sources: list[str] = list(dict.fromkeys(
+        normpath(source) for pattern in build_config['sources'] for source in sorted(glob(pattern))))
+    if not sources:
+        return BuildResult(succeeded=False, compiled=0, reused=0, relinked=False, failures=[
+            BuildFailure(step='sources', error=f'No sources matched {", ".join(build_config["sources"])}')])
+
+    include_dirs = _get_include_dirs(flags)
+    flags_key = '\0'.join([compiler, *flags])
+    file_cache: dict[str, bytes] = dict()
+    object_paths: list[str] = []
+    for source in sources:
+        try:
+            source_hash = _hash_with_local_headers(source, include_dirs, file_cache)
+        except OSError as e:
+            return BuildResult(succeeded=False, compiled=0, reused=0, relinked=False,
+                               failures=[BuildFailure(step=source, error=str(e))])
+        object_key = sha256(f'{flags_key}\0{source_hash}'.encode('utf-8')).hexdigest()
+        object_paths.append(join(cache_dir, f'{object_key}.o'))
+
+    makedirs(cache_dir, exist_ok=True)
+    reused: int = sum(1 for object_path in object_paths if isfile(object_path))
+    pool = ThreadPool(None)
+    compile_failures: list[BuildFailure | None] = pool.starmap(
+        _compile, [(compiler, flags, source, object_path) for source, object_path in zip(sources, object_paths)])
+    pool.close()
+    pool.join()
+    failures: list[BuildFailure] = [failure for failure in compile_failures if failure is not None]
+    if failures:
+        return BuildResult(succeeded=False, compiled=len(sources) - reused - len(failures), reused=reused,
+                           relinked=False, failures=failures)
+
+    link_key = sha256('\0'.join([compiler, *object_paths, *link_flags, output]).encode('utf-8')).hexdigest()
+    link_key_path = join(cache_dir, LINK_KEY_FILE)
+    previous_link_key = None
+    if isfile(link_key_path):
+        with open(link_key_path, "r", encoding='utf-8') as file:
+            previous_link_key = file.read()
+    if previous_link_key == link_key and isfile(output):
+        return BuildResult(succeeded=True, compiled=len(sources) - reused, reused=reused, relinked=False,
+                           failures=[])
+
+    try:
+        proc = subprocess.run([compiler, *object_paths, *link_flags, '-o', output], capture_output=True)
+    except OSError as e:
+        return BuildResult(succeeded=False, compiled=len(sources) - reused, reused=reused, relinked=False,
+                           failures=[BuildFailure(step='link', error=str(e))])
+    if proc.returncode != 0:
+        return BuildResult(succeeded=False, compiled=len(sources) - reused, reused=reused, relinked=False,
+                           failures=[BuildFailure(step='link', error=(proc.stderr or proc.stdout).decode(
+                               'utf-8', errors='replace'))])
+    with open(link_key_path, "w", encoding='utf-8') as file:
+        file.write(link_key)
+    _remove_stale_objects(cache_dir, object_paths)
+    return BuildResult(succeeded=True, compiled=len(sources) - reused, reused=reused, relinked=True, failures=[])
@@ -0,0 +1,94 @@
+import re
+from collections import Counter
+from itertools import zip_longest
+
+from utils.config import EXACT_COMPARATOR, UNORDERED_LINES_COMPARATOR, NUMERIC_TOLERANCE_COMPARATOR, \
+    REGEX_LINES_COMPARATOR, DEFAULT_TOLERANCE
+from utils.matam_types import LineMismatch
+
+
+def _unordered_lines_mismatches(expected_output: str, actual_output: str) -> list[LineMismatch]:
+    # Counting hashed lines is linear, unlike sorting both outputs
+    expected_lines = Counter(expected_output.splitlines())
+    actual_lines = Counter(actual_output.splitlines())
+    mismatches: list[LineMismatch] = []
+    for line, count in (expected_lines - actual_lines).items():
+        mismatches.extend([(None, line, None)] * count)
+    for line, count in (actual_lines - expected_lines).items():
+        mismatches.extend([(None, None, line)] * count)
+    return mismatches
+
+
+def _tokens_match(expected_token: str, actual_token: str, tolerance: float) -> bool:
+    if expected_token == actual_token:
+        return True
+    try:
+        return abs(float(expected_token) - float(actual_token)) <= tolerance
+    except ValueError:
+        return False
+
+
+def _numeric_tolerance_mismatches(expected_output: str, actual_output: str, tolerance: float) -> list[LineMismatch]:
+    mismatches: list[LineMismatch] = []
+    for index, (expected_line, actual_line) in enumerate(
+            zip_longest(expected_output.splitlines(), actual_output.splitlines())):
+        if expected_line is None or actual_line is None:
+            mismatches.append((index + 1, expected_line, actual_line))
+            continue
+        expected_tokens = expected_line.split()
+        actual_tokens = actual_line.split()
+        if len(expected_tokens) != len(actual_tokens) or not all(
+                _tokens_match(expected_token, actual_token, tolerance)
+                for expected_token, actual_token in zip(expected_tokens, actual_tokens)):
+            mismatches.append((index + 1, expected_line, actual_line))
+    return mismatches
+
+
+def _regex_lines_mismatches(expected_output: str, actual_output: str) -> list[LineMismatch]:
+    mismatches: list[LineMismatch] = []
+    for index, (expected_line, actual_line) in enumerate(
+            zip_longest(expected_output.splitlines(), actual_output.splitlines())):
+        if expected_line is None or actual_line is None:
+            mismatches.append((index + 1, expected_line, actual_line))
+            continue
+        if re.fullmatch(expected_line, actual_line) is None:
+            mismatches.append((index + 1, expected_line, actual_line))
+    return mismatches
+
+
+def find_invalid_regex_line(expected_output: str) -> tuple[int, re.error] | None:
+    """
+    Find the first line of an expected output compared with the regex_lines comparator that is not a valid regex
+    :return: The line number and the error compiling it, or None if all lines are valid
+    """
+    for index, expected_line in enumerate(expected_output.splitlines()):
+        try:
+            re.compile(expected_line)
+        except re.error as e:
+            return index + 1, e
+    return None
+
+
+def compare_outputs(expected_output: str, actual_output: str, comparator: str | None = None,
+                    expected_is_substr: bool = False,
+                    tolerance: float | None = None) -> tuple[bool, list[LineMismatch] | None]:
+    """
+    Compare a test's output to its expected output using the test's comparator.
+    :return: Whether the outputs match, and the mismatching lines for line based comparators
+    (None for the exact comparator, which is rendered as a full side-by-side diff)
+    """
+    if comparator is None or comparator == EXACT_COMPARATOR:
+        if expected_is_substr:
+            return expected_output in actual_output, None
+        return actual_output == expected_output, None
+
+    if comparator == UNORDERED_LINES_COMPARATOR:
+        mismatches = _unordered_lines_mismatches(expected_output, actual_output)
+    elif comparator == NUMERIC_TOLERANCE_COMPARATOR:
+        mismatches = _numeric_tolerance_mismatches(expected_output, actual_output,
+                                                   DEFAULT_TOLERANCE if tolerance is None else tolerance)
+    elif comparator == REGEX_LINES_COMPARATOR:
+        mismatches = _regex_lines_mismatches(expected_output, actual_output)
+    else:
+        raise ValueError(f'Unknown comparator "{comparator}"')
+    return len(mismatches) == 0, mismatches
@@ -0,0 +1,52 @@
+from hashlib import sha256
+from os.path import normpath
+
+from utils.matam_parsing import normalize_newlines, normalize_for_comparison
+from utils.matam_types import ExpectedOutputs
+
+
+def _read_file(path: str) -> bytes | str:
+    """
+    :return: File's content, or a description of the error if it could not be read
+    """
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError as e:
+        return f'Expected output file is missing. Exception: {str(e)}'
+    except OSError as e:
+        return f'Could not read expected output file. Exception: {str(e)}'
+
+
+def prefetch_expected_outputs(paths: list[str]) -> ExpectedOutputs:
+    """
+    Read all expected output files up front, in parallel, so their I/O does not interleave with running tests.
+    Each path is read once, and files with identical content share a single normalized string.
+    """
+    # norm path makes sure the path is formatted correctly
+    unique_paths: list[str] = list(dict.fromkeys(normpath(path) for path in paths))
+    if len(unique_paths) > 1:
+        from multiprocessing.dummy import Pool as ThreadPool
+        pool = ThreadPool(min(len(unique_paths), 32))
+        contents: list[bytes | str] = pool.map(_read_file, unique_paths)
+        pool.close()
+        pool.join()
+    else:
+        # Starting threads costs more than reading a single file
+        contents = [_read_file(path) for path in unique_paths]
+
+    expected_outputs = ExpectedOutputs(outputs=dict(), errors=dict())
+    outputs_by_hash: dict[str, str] = dict()
+    for path, content in zip(unique_paths, contents):
+        if isinstance(content, str):
+            expected_outputs['errors'][path] = content
+            continue
+        content_hash = sha256(content).hexdigest()
+        if content_hash not in outputs_by_hash:
+            try:
+                outputs_by_hash[content_hash] = normalize_for_comparison(normalize_newlines(content.decode('utf-8')))
+            except UnicodeDecodeError as e:
+                expected_outputs['errors'][path] = f'Expected output file is not valid UTF-8. Exception: {str(e)}'
+                continue
+        expected_outputs['outputs'][path] = outputs_by_hash[content_hash]
+    return expected_outputs
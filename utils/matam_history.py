@@ -0,0 +1,119 @@
+import json
+from datetime import datetime
+
+from utils.config import HISTORY_SIZE, REGRESSION_THRESHOLD_PERCENT, REGRESSION_MIN_DURATION_DELTA, \
+    REGRESSION_MIN_MEMORY_DELTA_KB, REGRESSION_NEWLY_FAILING, REGRESSION_NEWLY_PASSING, REGRESSION_OUTPUT_CHANGED, \
+    REGRESSION_SLOWER, REGRESSION_MORE_MEMORY
+from utils.matam_types import TestResult, HistoryRun, TestRecord, Regression, RunComparison
+
+
+HISTORY_RUN_KEYS = ('suite', 'timestamp', 'tests')
+
+
+def _is_history(data: object) -> bool:
+    return isinstance(data, list) and all(
+        isinstance(run, dict) and all(key in run for key in HISTORY_RUN_KEYS) and isinstance(run['tests'], dict)
+        for run in data)
+
+
+def load_history(history_path: str) -> list[HistoryRun]:
+    """
+    :return: The runs saved in the history file, or an empty list if there is none (or history is disabled)
+    """
+    if HISTORY_SIZE <= 0:
+        return []
+    try:
+        with open(history_path, "r", encoding='utf-8') as file:
+            history = json.load(file)
+    except FileNotFoundError:
+        return []
+    except (IOError, json.JSONDecodeError) as e:
+        print(f"Error reading results history, starting a new one: {e}")
+        return []
+    if not _is_history(history):
+        print(f"Error reading results history, starting a new one: unexpected format in {history_path}")
+        return []
+    return history
+
+
+def save_history(history_path: str, history: list[HistoryRun]) -> None:
+    if HISTORY_SIZE <= 0:
+        return
+    try:
+        with open(history_path, "w", encoding='utf-8') as file:
+            json.dump(history[-HISTORY_SIZE:], file)
+    except IOError as e:
+        print(f"Could not save results history: {e}")
+
+
+def create_history_run(results: list[TestResult], suite: str) -> HistoryRun:
+    return HistoryRun(
+        timestamp=datetime.now().isoformat(timespec='seconds'),
+        suite=suite,
+        tests={
+            result['name']: TestRecord(
+                passed=result['passed'],
+                output_hash=result.get('output_hash', None),
+                duration=result.get('duration', None),
+                peak_memory_kb=result.get('peak_memory_kb', None)
+            )
+            # Skipped tests have no result to compare
+            for result in results if not result.get('skipped')
+        }
+    )
+
+
+def _grew_beyond_threshold(baseline: float | None, current: float | None, min_delta: float) -> bool:
+    if baseline is None or current is None:
+        return False
+    return current - baseline > min_delta and current > baseline * (1 + REGRESSION_THRESHOLD_PERCENT / 100)
+
+
+def _format_change(baseline: float, current: float, unit: str) -> str:
+    change = f' ({(current - baseline) / baseline * 100:+.0f}%)' if baseline else ''
+    return f'{baseline:.1f}{unit} → {current:.1f}{unit}{change}'
+
+
+def _format_trend(history: list[HistoryRun], name: str, metric: str, scale: float, unit: str) -> str:
+    values = [run['tests'][name].get(metric) for run in history if name in run['tests']]
+    return ' → '.join(f'{value * scale:.1f}{unit}' for value in values if value is not None)
+
+
+def compare_to_history(history: list[HistoryRun], current: HistoryRun) -> RunComparison | None:
+    """
+    Compare the current run to the latest run of the same tests json file in the history
+    :return: None if there is no previous run
+    """
+    history = [run for run in history if run.get('suite') == current['suite']]
+    if not history:
+        return None
+    baseline = history[-1]
+    regressions: list[Regression] = []
+    for name, record in current['tests'].items():
+        baseline_record = baseline['tests'].get(name, None)
+        if baseline_record is None:
+            continue
+        if baseline_record['passed'] and not record['passed']:
+            regressions.append(Regression(name=name, kind=REGRESSION_NEWLY_FAILING, description='', trend=None))
+        elif not baseline_record['passed'] and record['passed']:
+            regressions.append(Regression(name=name, kind=REGRESSION_NEWLY_PASSING, description='', trend=None))
+        elif baseline_record['output_hash'] is not None and record['output_hash'] is not None \
+                and baseline_record['output_hash'] != record['output_hash']:
+            regressions.append(Regression(name=name, kind=REGRESSION_OUTPUT_CHANGED,
+                                          description=f"{baseline_record['output_hash'][:12]} → "
+                                                      f"{record['output_hash'][:12]}",
+                                          trend=None))
+
+        if _grew_beyond_threshold(baseline_record['duration'], record['duration'], REGRESSION_MIN_DURATION_DELTA):
+            regressions.append(Regression(
+                name=name, kind=REGRESSION_SLOWER,
+                description=_format_change(baseline_record['duration'] * 1000, record['duration'] * 1000, 'ms'),
+                trend=_format_trend([*history, current], name, 'duration', 1000, 'ms')))
+        if _grew_beyond_threshold(baseline_record['peak_memory_kb'], record['peak_memory_kb'],
+                                  REGRESSION_MIN_MEMORY_DELTA_KB):
+            regressions.append(Regression(
+                name=name, kind=REGRESSION_MORE_MEMORY,
+                description=_format_change(baseline_record['peak_memory_kb'] / 1024,
+                                           record['peak_memory_kb'] / 1024, 'MB'),
+                trend=_format_trend([*history, current], name, 'peak_memory_kb', 1 / 1024, 'MB')))
+    return RunComparison(baseline_timestamp=baseline['timestamp'], regressions=regressions)
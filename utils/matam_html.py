@@ -1,9 +1,7 @@
 from utils.config import NORMAL_HTML_NEWLINE, HTML_COLORED_NEWLINE, HTML_COLORED_WHITESPACE, USE_OLD_DIFF_STYLE
-from utils.matam_types import Summary, TestResult
+from utils.matam_types import Summary, TestResult, RepeatStats, LineMismatch, RunComparison
 from os import getcwd, chdir
-if not USE_OLD_DIFF_STYLE:
-    import html
-    import difflib
+import html
 
 
 def simple_html_format(text: str) -> str:
@@ -48,7 +46,42 @@ def format_summary_for_html(summary: Summary) -> str:
     return report
 
 
-def generate_summary_html_content(results: list[TestResult], amount_failed: int) -> str:
+def _format_duration(duration: float | None) -> str:
+    return 'N/A' if duration is None else f'{duration * 1000:.1f}ms'
+
+
+def format_repeat_stats_for_html(stats: RepeatStats) -> str:
+    report = f'<p>Passed {stats["passed_runs"]} out of {stats["runs"]} runs. ' \
+             f'Runtime: min {_format_duration(stats["min_duration"])}, ' \
+             f'median {_format_duration(stats["median_duration"])}, ' \
+             f'p95 {_format_duration(stats["p95_duration"])}</p>'
+    if len(stats['distinct_outputs']) < 2:
+        return report
+
+    report += f'<p>{len(stats["distinct_outputs"])} distinct outputs seen:</p>'
+    for output in stats['distinct_outputs']:
+        kind = 'Error' if output['is_error'] else 'Output'
+        status = 'passed' if output['passed'] else 'failed'
+        report += f'<details><summary>{kind} {output["hash"][:12]} - seen {output["count"]} times ({status})' \
+                  f'</summary><code>{simple_html_format(output["output"] or "")}</code></details>'
+    return report
+
+
+def format_comparison_for_html(comparison: RunComparison) -> str:
+    report = f'<h3>Changes since previous run ({comparison["baseline_timestamp"]})</h3>'
+    if not comparison['regressions']:
+        return report + '<p>No changes.</p>'
+
+    report += '<table class="comparison-table"><tr><th>Test</th><th>Change</th><th>Details</th><th>Trend</th></tr>'
+    for regression in comparison['regressions']:
+        report += f'<tr><td>{simple_html_format(regression["name"])}</td><td>{regression["kind"]}</td>' \
+                  f'<td>{regression["description"]}</td><td>{regression["trend"] or ""}</td></tr>'
+    report += '</table>'
+    return report
+
+
+def generate_summary_html_content(results: list[TestResult], amount_failed: int,
+                                  comparison: RunComparison | None = None) -> str:
     html = '''
 <!DOCTYPE html>
 <html>
@@ -60,14 +93,25 @@ def generate_summary_html_content(results: list[TestResult], amount_failed: int)
 
     '''
     html += f'<h2><span style="color:red;">{amount_failed} Failed</span> out of {len(results)}</h2>'
+    amount_skipped: int = sum(1 for result in results if result.get('skipped'))
+    if amount_skipped > 0:
+        html += f'<h3><span style="color:gray;">{amount_skipped} Skipped</span> (leak check budget ran out)</h3>'
+    amount_flaky: int = sum(1 for result in results if result.get('repeat_stats') and result['repeat_stats']['flaky'])
+    if amount_flaky > 0:
+        html += f'<h3><span style="color:orange;">{amount_flaky} Flaky</span> (results varied between runs)</h3>'
+    if comparison is not None:
+        html += format_comparison_for_html(comparison)
     for result in results:
         command_element: str = f"<p>Test Command:</p><code>{simple_html_format(result['command'])}</code>" \
             if result.get('command', None) else ''
+        repeat_stats_element: str = format_repeat_stats_for_html(result['repeat_stats']) \
+            if result.get('repeat_stats', None) else ''
         html += f'''
-        <button type="button" class="collapsible" style="color:{'green' if result['passed'] else 'red'}">
+        <button type="button" class="collapsible" style="color:{'gray' if result.get('skipped') else 'green' if result['passed'] else 'red'}">
         {result['name']}</button>
 <div class="content">
   {command_element}
+  {repeat_stats_element}
   <p>{format_summary_for_html(result.get('summary'))}</p>
 </div>
 '''
@@ -108,6 +152,8 @@ def generate_summary_html_content(results: list[TestResult], amount_failed: int)
         .line.added { background: #bfe4ca; color: #22863a; }
         .line.removed { background: #ffeef0; color: #cb2431; }
         .line.empty { background: #f9f9f9; color: #aaa; }
+        .comparison-table { border-collapse: collapse; margin-bottom: 1em; }
+        .comparison-table td, .comparison-table th { border: 1px solid #ddd; padding: 4px 8px; text-align: left; }
         </style>
         '''
 
@@ -216,13 +262,14 @@ def create_html_report(html: str, html_name: str) -> None:
         raise e
 
 
-def create_html_report_from_results(results: list[TestResult], initial_workdir: str, html_name: str) -> None:
+def create_html_report_from_results(results: list[TestResult], initial_workdir: str, html_name: str,
+                                    comparison: RunComparison | None = None) -> None:
     amount_failed: int = 0
     for t in results:
         if t.get('passed', False) is False:
             amount_failed += 1
 
-    html: str = generate_summary_html_content(results, amount_failed)
+    html: str = generate_summary_html_content(results, amount_failed, comparison)
     curr_workdir: str = getcwd()
     chdir(initial_workdir)
     create_html_report(html, html_name)
@@ -251,6 +298,8 @@ def generate_side_by_side_diff(expected_output: str, actual_output: str, test_na
     expected_lines = expected_output.splitlines(keepends=True)
     actual_lines = actual_output.splitlines(keepends=True)
 
+    # difflib is only needed to render failures, and is slow to import
+    import difflib
     differ = difflib.Differ()
     diff = list(differ.compare(expected_lines, actual_lines))
 
@@ -295,3 +344,47 @@ def generate_side_by_side_diff(expected_output: str, actual_output: str, test_na
     """
 
     return f"<h3>{html.escape(test_name)}</h3>{html_diff}"
+
+
+def generate_mismatch_diff(mismatches: list[LineMismatch], test_name: str) -> str | None:
+    """
+    Generate a side-by-side HTML diff view (Expected | Actual) that only shows the lines
+    a line based comparator found to be different.
+    """
+    if USE_OLD_DIFF_STYLE:
+        return None
+
+    left_column = []
+    right_column = []
+    for line_number, expected_line, actual_line in mismatches:
+        prefix = '' if line_number is None else f'{line_number}: '
+        if expected_line is None:
+            left_column.append("<div class='line empty'></div>")
+        else:
+            left_column.append(f"<div class='line removed'>{prefix}{_mark_invisibles(expected_line)}</div>")
+        if actual_line is None:
+            right_column.append("<div class='line empty'></div>")
+        else:
+            right_column.append(f"<div class='line added'>{prefix}{_mark_invisibles(actual_line)}</div>")
+
+    html_diff = f"""
+    <div class="diff-container">
+        <div class="diff-column">
+            <div class="diff-header">Expected ({len([m for m in mismatches if m[1] is not None])} unmatched lines)</div>
+            {''.join(left_column)}
+        </div>
+        <div class="diff-column">
+            <div class="diff-header">Actual ({len([m for m in mismatches if m[2] is not None])} unmatched lines)</div>
+            {''.join(right_column)}
+        </div>
+    </div>
+    """
+
+    return f"<h3>{html.escape(test_name)}</h3>{html_diff}"
+
+
+def generate_comparison_diff(expected_output: str, actual_output: str, test_name: str,
+                             mismatches: list[LineMismatch] | None) -> str | None:
+    if mismatches is None:
+        return generate_side_by_side_diff(expected_output, actual_output, test_name)
+    return generate_mismatch_diff(mismatches, test_name)
@@ -0,0 +1,119 @@
+import os
+import shlex
+import signal
+from threading import Lock, local
+
+from utils.config import IS_WINDOWS, MEMORY_LIMIT_MB, OUTPUT_SIZE_LIMIT_MB, USE_CPU_TIME_LIMIT, TIMEOUT, PIN_CPUS
+
+SHELL_CONTROL_OPERATORS = {';', '&', '&&', '|', '||', '(', ')', ';;'}
+
+# Core of the current worker thread, kept per thread so it goes away with the thread
+_worker = local()
+_assigned_workers: int = 0
+_assigned_workers_lock = Lock()
+
+
+def get_available_cores() -> list[int]:
+    # sched_getaffinity respects cgroup/taskset restrictions, but is only available on Linux
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_worker_count() -> int | None:
+    """
+    Amount of worker threads to run tests with, None to use cpu count
+    """
+    if PIN_CPUS:
+        return len(get_available_cores())
+    return None
+
+
+def get_worker_core() -> int | None:
+    """
+    Assign each worker thread a core of its own (round-robin, in case there are more workers than cores)
+    """
+    global _assigned_workers
+    if not PIN_CPUS or not hasattr(os, 'sched_setaffinity'):
+        return None
+    if not hasattr(_worker, 'core'):
+        with _assigned_workers_lock:
+            cores = get_available_cores()
+            _worker.core = cores[_assigned_workers % len(cores)]
+            _assigned_workers += 1
+    return _worker.core
+
+
+def inherit_worker_core(core: int | None) -> None:
+    """
+    Pin a helper thread (e.g. running a repetition of a test) to the core of the worker thread that started it,
+    instead of taking a core of its own
+    """
+    _worker.core = core
+
+
+def _is_simple_command(command: str) -> bool:
+    """
+    Whether the command is a single command (possibly with redirections), which the shell can be replaced with
+    """
+    try:
+        tokens = shlex.shlex(command, posix=True, punctuation_chars=True)
+        return not any(token in SHELL_CONTROL_OPERATORS for token in tokens)
+    except ValueError:
+        return False
+
+
+def create_launcher_command(command: str) -> str:
+    """
+    Prefix a test's shell command with the configured resource limits (using ulimit), so the limits are applied
+    by the shell itself and inherited by the tested program
+    :return: The command as is, when there is nothing to apply (or on Windows, where there is no ulimit)
+    """
+    if IS_WINDOWS:
+        return command
+    limits: list[str] = []
+    if MEMORY_LIMIT_MB > 0:
+        # ulimit -v is in KB
+        limits.append(f'ulimit -v {MEMORY_LIMIT_MB * 1024}')
+    if OUTPUT_SIZE_LIMIT_MB > 0:
+        # ulimit -f is in 512 bytes blocks in POSIX shells
+        limits.append(f'ulimit -f {OUTPUT_SIZE_LIMIT_MB * 2048}')
+    if USE_CPU_TIME_LIMIT:
+        # Soft limit sends SIGXCPU, hard limit is kept slightly above so the process gets killed
+        # even if it handles SIGXCPU. Both limits are set first, as the soft limit can't exceed the hard limit
+        limits.append(f'ulimit -t {TIMEOUT + 1}')
+        limits.append(f'ulimit -S -t {TIMEOUT}')
+    if not limits:
+        return command
+    # Replacing the shell with the test makes limit signals (and kills on timeout) reach the test directly
+    return f'{" && ".join(limits)} && {"exec " if _is_simple_command(command) else ""}{command}'
+
+
+def pin_process(pid: int) -> None:
+    """
+    Pin a process started by the current thread to the worker's core, if workers are pinned.
+    Processes the shell starts afterward inherit its affinity
+    """
+    core = get_worker_core()
+    if core is not None:
+        os.sched_setaffinity(pid, {core})
+
+
+def describe_limit_violation(returncode: int) -> str | None:
+    """
+    Check whether a test's process was killed for exceeding one of its resource limits
+    :param returncode: Return code of the shell running the test. A signal is reported either as a negative
+    return code (when the shell replaced itself with the test) or as 128 + signal number
+    :return: Description of the exceeded limit, or None
+    """
+    # Only signals of configured limits, without a limit the tested program is free to exit with any code
+    violations: dict[int | None, str] = dict()
+    if USE_CPU_TIME_LIMIT:
+        violations[getattr(signal, 'SIGXCPU', None)] = f'Test exceeded its CPU time limit of {TIMEOUT} seconds'
+    if OUTPUT_SIZE_LIMIT_MB > 0:
+        violations[getattr(signal, 'SIGXFSZ', None)] = \
+            f'Test exceeded its output file size limit of {OUTPUT_SIZE_LIMIT_MB}MB'
+    for signal_number, description in violations.items():
+        if signal_number is not None and returncode in (-signal_number, 128 + signal_number):
+            return description
+    return None
@@ -1,8 +1,12 @@
 import sys
+from os import linesep
+from hashlib import sha256
+from math import ceil
 
 from utils.config import IS_MAC_OS, EXPECTED_OUTPUT_FILE, EXPECTED_OUTPUT_IS_SUBSTR, NORMAL_HTML_NEWLINE, \
-    LEAKS_CHECKER_NAME
-from utils.matam_types import Summary, TestCase, TestParamRange, TestParams
+    LEAKS_CHECKER_NAME, COMPARATOR, TOLERANCE, RANGE_GROUP, COMPARISON_IGNORE_BLANK_LINES, COMPARISON_TRIM_END_SPACES
+from utils.matam_types import Summary, TestCase, TestParamRange, TestParams, RepeatStats, RepeatOutput, \
+    RepetitionOutcome
 
 if sys.version_info < (3, 10):
     sys.exit("Python %s.%s or later is required.\n" % (3, 10))
@@ -13,6 +17,17 @@ def normalize_newlines(txt: str) -> str:
     return txt.replace('\r\n', '\n').replace('\r', '\n')
 
 
+def normalize_for_comparison(txt: str) -> str:
+    # Remove blank lines
+    if COMPARISON_IGNORE_BLANK_LINES != 0:
+        txt = linesep.join([s for s in txt.splitlines() if s])
+
+    # Trim spaces from end of lines
+    if COMPARISON_TRIM_END_SPACES != 0:
+        txt = linesep.join([s.rstrip() for s in txt.splitlines()])
+    return txt
+
+
 def test_exception_to_error_text(exception: Exception) -> str:
     if exception.stderr:
         return str(exception.stderr)
@@ -83,6 +98,71 @@ def summarize_failed_to_check_for_leaks(test_name: str, exception: str) -> Summa
     )
 
 
+def hash_output(output: str) -> str:
+    return sha256(output.encode('utf-8')).hexdigest()
+
+
+def summarize_repetitions(outcomes: list[RepetitionOutcome]) -> RepeatStats:
+    """
+    Aggregate the outcomes of running the same test multiple times.
+    Outputs (or errors, for runs that did not finish properly) are deduplicated by content hash.
+    """
+    distinct_outputs: dict[str, RepeatOutput] = dict()
+    for outcome in outcomes:
+        is_error = outcome['error'] is not None
+        content = outcome['error'] if is_error else outcome['output']
+        content_hash = hash_output(f'{is_error}:{content}')
+        if content_hash in distinct_outputs:
+            distinct_outputs[content_hash]['count'] += 1
+        else:
+            distinct_outputs[content_hash] = RepeatOutput(hash=content_hash, count=1, output=content,
+                                                          passed=outcome['passed'], is_error=is_error)
+
+    from statistics import median
+    durations = sorted(outcome['duration'] for outcome in outcomes if outcome['duration'] is not None)
+    passed_runs = sum(1 for outcome in outcomes if outcome['passed'])
+    return RepeatStats(
+        runs=len(outcomes),
+        passed_runs=passed_runs,
+        distinct_outputs=list(distinct_outputs.values()),
+        min_duration=durations[0] if durations else None,
+        median_duration=median(durations) if durations else None,
+        # Nearest-rank percentile
+        p95_duration=durations[max(0, ceil(0.95 * len(durations)) - 1)] if durations else None,
+        flaky=0 < passed_runs < len(outcomes) or len(distinct_outputs) > 1
+    )
+
+
+def summarize_repeated_test(test_name: str, stats: RepeatStats, expected_output: str,
+                            sample: RepetitionOutcome, diff_html: str | None) -> Summary:
+    runs = stats['runs']
+    if not stats['flaky'] and stats['passed_runs'] == runs:
+        return Summary(title=f"\n{test_name} - Passed {runs} out of {runs} runs!\n")
+
+    if stats['flaky']:
+        title = f"{test_name} - Flaky! Passed {stats['passed_runs']} out of {runs} runs"
+    else:
+        title = f"{test_name} - Failed all {runs} runs!"
+    return Summary(
+        title=title,
+        expected=expected_output,
+        actual=sample['output'] if sample['error'] is None else None,
+        error=sample['error'],
+        diff_html=diff_html if sample['error'] is None else None
+    )
+
+
+def summarize_failed_build(step: str, error: str) -> Summary:
+    return Summary(
+        title=f'Build failed at {step}! Tests were not run.',
+        error=error
+    )
+
+
+def summarize_skipped_leaks_test(test_name: str) -> Summary:
+    return Summary(title=f'\n{test_name} - {LEAKS_CHECKER_NAME} skipped, leak check budget ran out\n')
+
+
 def parse_test_placeholders(field: str, ranged_value: Any) -> str:
     return field.replace(':::placeholder:::', str(ranged_value))
 
@@ -110,7 +190,10 @@ def parse_ranged_tests(tests: List[TestCase]) -> List[TestCase]:
                     'output_file': parse_test_placeholders(test['output_file'], range_item),
                     EXPECTED_OUTPUT_FILE: parse_test_placeholders(test[EXPECTED_OUTPUT_FILE], range_item),
                     'run_leaks': test.get('run_leaks', None),
-                    EXPECTED_OUTPUT_IS_SUBSTR: test.get(EXPECTED_OUTPUT_IS_SUBSTR, False)
+                    EXPECTED_OUTPUT_IS_SUBSTR: test.get(EXPECTED_OUTPUT_IS_SUBSTR, False),
+                    COMPARATOR: test.get(COMPARATOR, None),
+                    TOLERANCE: test.get(TOLERANCE, None),
+                    RANGE_GROUP: index
                 }
 
                 tests.append(parsed_test)
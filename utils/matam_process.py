@@ -0,0 +1,53 @@
+import os
+import subprocess
+from os import getcwd
+from threading import Thread
+from time import perf_counter
+
+from utils.config import IS_MAC_OS
+from utils.matam_limits import pin_process
+from utils.matam_types import ProcessRun
+
+
+def _wait_with_usage(proc: subprocess.Popen, timeout: float) -> int | None:
+    """
+    Wait for the process while collecting its resource usage, which Popen does not expose.
+    The usage of a waited process includes its own waited children (the tested program, launched by the shell).
+    :return: Peak resident memory in KB, or None if it can't be measured on this platform
+    """
+    if not hasattr(os, 'wait4'):
+        proc.wait(timeout=timeout)
+        return None
+
+    wait_result: list[tuple[int, int, object]] = []
+    waiter = Thread(target=lambda: wait_result.append(os.wait4(proc.pid, 0)), daemon=True)
+    waiter.start()
+    waiter.join(timeout)
+    if waiter.is_alive():
+        proc.kill()
+        waiter.join()
+        proc.returncode = os.waitstatus_to_exitcode(wait_result[0][1])
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+
+    _, status, usage = wait_result[0]
+    # Let Popen know the process was already waited for
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return usage.ru_maxrss // 1024 if IS_MAC_OS else usage.ru_maxrss
+
+
+def run_process(command: str, timeout: float) -> ProcessRun:
+    """
+    Run a shell command from the current workdir and measure its wall time and peak memory.
+    The process is pinned to the current worker's core, if workers are pinned.
+    If the command exceeds the timeout it is killed and subprocess.TimeoutExpired is re-raised.
+    """
+    start = perf_counter()
+    with subprocess.Popen(command, shell=True, cwd=getcwd()) as proc:
+        try:
+            pin_process(proc.pid)
+            peak_memory_kb = _wait_with_usage(proc, timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            raise
+    return ProcessRun(returncode=proc.returncode, duration=perf_counter() - start, peak_memory_kb=peak_memory_kb)
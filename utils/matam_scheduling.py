@@ -0,0 +1,56 @@
+from collections import deque
+
+from utils.config import TEST_NAME, TEMPLATE_NAME, RANGE_GROUP
+from utils.matam_types import TestCase
+
+
+def _spread_order(count: int) -> list[int]:
+    """
+    Deterministic order of indices in range(count) that spreads early picks evenly:
+    first, last, middle, then the middles of each half and so on
+    """
+    if count == 0:
+        return []
+    order = [0] if count == 1 else [0, count - 1]
+    intervals = deque([(0, count - 1)])
+    while intervals:
+        low, high = intervals.popleft()
+        if high - low < 2:
+            continue
+        middle = (low + high) // 2
+        order.append(middle)
+        intervals.append((low, middle))
+        intervals.append((middle, high))
+    return order
+
+
+def prioritize_leak_tests(tests: list[TestCase], failed_test_names: set[str]) -> list[TestCase]:
+    """
+    Order tests for leak checking, for when there is not enough time to check all of them:
+    1. Tests that failed, as their leaks are the most likely to be relevant
+    2. One test of each template not covered so far, as each template exercises different code
+    3. The rest, sampled across each params_range expansion (and tests not generated by a range),
+       taking a test from each expansion in turn
+    """
+    prioritized: list[TestCase] = [test for test in tests if test[TEST_NAME] in failed_test_names]
+    covered_templates: set[str] = {test[TEMPLATE_NAME] for test in prioritized}
+    for test in tests:
+        if test[TEST_NAME] not in failed_test_names and test[TEMPLATE_NAME] not in covered_templates:
+            covered_templates.add(test[TEMPLATE_NAME])
+            prioritized.append(test)
+
+    picked_ids: set[int] = {id(test) for test in prioritized}
+    groups: dict[int | str, list[TestCase]] = dict()
+    for test in tests:
+        if id(test) not in picked_ids:
+            # Tests that were not generated by a range are a group of their own
+            group_key = test.get(RANGE_GROUP, None)
+            groups.setdefault(test[TEST_NAME] if group_key is None else group_key, []).append(test)
+
+    spread_groups = deque(deque(group[index] for index in _spread_order(len(group))) for group in groups.values())
+    while spread_groups:
+        group = spread_groups.popleft()
+        prioritized.append(group.popleft())
+        if group:
+            spread_groups.append(group)
+    return prioritized
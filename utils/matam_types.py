@@ -6,6 +6,8 @@ else:
 
 TestTemplates: TypeAlias = dict[str, str]
 TestParams: TypeAlias = dict[str, str]
+# Line number (None when line order is irrelevant), expected line, actual line
+LineMismatch: TypeAlias = tuple[int | None, str | None, str | None]
 
 class TestParamRange(TypedDict):
     first: int
@@ -19,13 +21,41 @@ class TestCase(TypedDict):
     output_file: str
     expected_output_file: str
     expected_output_is_substring: bool | None
+    comparator: str | None
+    tolerance: float | None
     run_leaks: bool | None
     params_range: TestParamRange | List[str] | None
+    # Index of the params_range test the test was generated from
+    range_group: int | None
+
+
+class BuildConfig(TypedDict):
+    compiler: str | None
+    flags: list[str] | None
+    link_flags: list[str] | None
+    sources: list[str]
+    output: str
+    cache_dir: str | None
+
+
+class BuildFailure(TypedDict):
+    # Source file that failed to compile, or the name of the build step that failed
+    step: str
+    error: str
+
+
+class BuildResult(TypedDict):
+    succeeded: bool
+    compiled: int
+    reused: int
+    relinked: bool
+    failures: list[BuildFailure]
 
 
 class TestFile(TypedDict):
     templates: TestTemplates
     tests: list[TestCase]
+    build: BuildConfig | None
 
 
 class Summary(TypedDict):
@@ -36,9 +66,81 @@ class Summary(TypedDict):
     diff_html: str | None
 
 
+class RepeatOutput(TypedDict):
+    hash: str
+    count: int
+    output: str
+    passed: bool
+    is_error: bool
+
+
+class RepeatStats(TypedDict):
+    runs: int
+    passed_runs: int
+    distinct_outputs: list[RepeatOutput]
+    min_duration: float | None
+    median_duration: float | None
+    p95_duration: float | None
+    flaky: bool
+
+
+class RepetitionOutcome(TypedDict):
+    passed: bool
+    output: str | None
+    error: str | None
+    duration: float | None
+    peak_memory_kb: int | None
+
+
+class ProcessRun(TypedDict):
+    returncode: int
+    duration: float
+    peak_memory_kb: int | None
+
+
+class ExpectedOutputs(TypedDict):
+    # Normalized expected output by (normalized) path, files with identical content share the same string
+    outputs: dict[str, str]
+    # Description of the error by path, for files that could not be read
+    errors: dict[str, str]
+
+
 class TestResult(TypedDict):
     name: str
     summary: Summary
     passed: bool
     command: str | None
+    repeat_stats: RepeatStats | None
+    skipped: bool | None
+    duration: float | None
+    peak_memory_kb: int | None
+    output_hash: str | None
+
+
+class TestRecord(TypedDict):
+    passed: bool
+    output_hash: str | None
+    duration: float | None
+    peak_memory_kb: int | None
+
+
+class HistoryRun(TypedDict):
+    timestamp: str
+    # Path of the tests json file of the run
+    suite: str
+    tests: dict[str, TestRecord]
+
+
+class Regression(TypedDict):
+    name: str
+    # One of the REGRESSION_* kinds in config
+    kind: str
+    description: str
+    # Values of the regressed metric across the stored history, for performance regressions
+    trend: str | None
+
+
+class RunComparison(TypedDict):
+    baseline_timestamp: str
+    regressions: list[Regression]
 